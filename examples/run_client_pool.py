@@ -24,8 +24,9 @@ async def run_client(pool: ConnectionPool):
 
 async def run_pool():
     async with ConnectionPool(**POOL_SETTINGS) as pool:
-        clients = [run_client(pool) for _ in range(CLIENTS_COUNT)]
-        await asyncio.gather(*clients)
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(CLIENTS_COUNT):
+                tg.create_task(run_client(pool))
 
 
 if __name__ == "__main__":
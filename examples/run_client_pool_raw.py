@@ -14,16 +14,17 @@ RANDOM_SLEEP = (0, 5)
 
 async def run_client(pool: ConnectionPool, commands: List[List[bytes]]):
     async with pool.acquire() as connection:
-        for command in commands:
-            response = await connection.execute(*command)
+        responses = await connection.execute_many(*commands)
+        for command, response in zip(commands, responses):
             logging.debug(f'{b" ".join(command)} -> {response}')
-            await asyncio.sleep(random.randint(*RANDOM_SLEEP))
+        await asyncio.sleep(random.randint(*RANDOM_SLEEP))
 
 
 async def run_pool(*commands: List[List[bytes]]):
     pool = await ConnectionPool(**POOL_SETTINGS)
-    coros = [run_client(pool, command) for command in commands]
-    await asyncio.gather(*coros)
+    async with asyncio.TaskGroup() as tg:
+        for command in commands:
+            tg.create_task(run_client(pool, command))
     await pool.close()
 
 
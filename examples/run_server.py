@@ -9,5 +9,12 @@ if __name__ == "__main__":
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
     logger.addHandler(logging.StreamHandler())
+    try:
+        import aiofastnet
+
+        # Faster transports for every event loop created from now on
+        aiofastnet.install_policy()
+    except ImportError:
+        pass
     server = Server(host="127.0.0.1", port=7272, closing_delay=300)
     server.run()
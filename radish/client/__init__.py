@@ -1,3 +1,3 @@
-from .client import Connection, ConnectionPool
+from .client import AutoBatcher, Connection, ConnectionPool, PipelinedConnection
 
-__all__ = ["Connection", "ConnectionPool"]
+__all__ = ["AutoBatcher", "Connection", "ConnectionPool", "PipelinedConnection"]
@@ -1,19 +1,55 @@
 import logging
 import asyncio
-from collections import namedtuple
-
-from radish.protocol import process_reader, process_writer
-from radish.exceptions import RadishClientError, RadishConnectionError
+from collections import deque
+
+from radish.protocol import (
+    NEED_MORE,
+    READ_SIZE,
+    WRITE_BUFFER_HIGH_WATER,
+    RESPParser,
+    process_reader,
+    process_writer_many,
+    serialize,
+)
+from radish.exceptions import RadishClientError, RadishConnectionError, RadishError
 
 from .commands import CommandsMixin
 
+try:
+    import aiofastnet
+except ImportError:
+    aiofastnet = None
+
+_log = logging.getLogger(__name__)
 
-Stream = namedtuple("Stream", ["reader", "writer"])
+
+async def _open_connection(host, port, loop, limit):
+    # aiofastnet is a faster drop-in for asyncio transports, use it if installed
+    if aiofastnet is not None:
+        return await aiofastnet.open_connection(loop, host, port, limit=limit)
+    return await asyncio.open_connection(host, port, limit=limit)
 
 
 class ConnectionPool:
 
-    __slots__ = ("_loop", "_queue", "_clients", "_inited", "_closed", "_min_size")
+    __slots__ = (
+        "_loop",
+        "_free",
+        "_clients",
+        "_inited",
+        "_closed",
+        "_min_size",
+        "_max_size",
+        "_host",
+        "_port",
+        "_inactive_time",
+        "_auto_batch",
+        "_batcher",
+        "_reaper",
+    )
+
+    # Maximum number of connections opened or closed at the same time
+    _max_concurrency = 16
 
     def __init__(
         self,
@@ -23,6 +59,7 @@ class ConnectionPool:
         max_size=10,
         inactive_time=300,
         loop=None,
+        auto_batch=False,
     ):
         """
         Radish connection pool holder.
@@ -44,6 +81,16 @@ class ConnectionPool:
                 async with pool.acquire() as con:  # type: Connection
                     assert await con.ping() == b'PONG'
 
+        Borrowing connection without context manager object:
+
+        .. code-block:: python
+
+            con = await pool.borrow()
+            try:
+                assert await con.ping() == b'PONG'
+            finally:
+                pool.release(con)
+
         :param host:
             Radish DB server host to connect.
 
@@ -55,63 +102,143 @@ class ConnectionPool:
 
         :param max_size:
             Maximum number of connections in the pool.
+            Connections above ``min_size`` are created on demand.
 
         :param inactive_time:
             After this number of seconds inactive connections should be closed.
 
         :param loop:
             Asyncio event loop.
+
+        :param auto_batch:
+            Share one connection between all acquirers and pipeline
+            their concurrent commands (see :class:`AutoBatcher`).
+            Only this connection is opened, ``min_size`` is not used.
         """
         if loop is None:
             loop = asyncio.get_event_loop()
         self._loop = loop
-        self._queue = asyncio.LifoQueue(maxsize=max_size, loop=self._loop)
+        self._free = _StackPool(self._loop)
         self._clients = []
-        for _ in range(max_size):
-            cl = Connection(
-                host=host, port=port, pool=self, inactive_time=inactive_time
-            )
-            self._queue.put_nowait(cl)
-            cl._acquired = False
-            self._clients.append(cl)
+        self._host = host
+        self._port = port
+        self._inactive_time = inactive_time
+        self._min_size = min_size
+        self._max_size = max_size
+        self._auto_batch = auto_batch
+        # Connections are never handed out from the free list with auto batching
+        if not auto_batch:
+            for _ in range(min_size):
+                self._free.put(self._new_connection())
 
         self._inited = False
         self._closed = False
-        self._min_size = min_size
+        self._batcher = None
+        self._reaper = None
 
     async def _init(self):
         if self._inited:
             return None
         if self._closed:
             raise RadishClientError("Pool is closed")
-        connect_tasks = [cl.connect() for cl in self._clients[-self._min_size :]]
-        await asyncio.gather(*connect_tasks, loop=self._loop)
+        if self._auto_batch:
+            # Only the shared connection is opened
+            shared = self._new_connection()
+            await shared.connect()
+            self._batcher = AutoBatcher(shared)
+        else:
+            await self._for_each_client(Connection.connect)
+        if self._inactive_time:
+            self._reaper = asyncio.ensure_future(self._close_inactive())
         self._inited = True
         return self
 
+    async def _close_inactive(self):
+        # One pool-wide sweeper instead of a timer per connection
+        while not self._closed:
+            await asyncio.sleep(self._inactive_time / 10)
+            deadline = self._loop.time() - self._inactive_time
+            inactive = [
+                cl for cl in self._free if cl._connected and cl._last_used < deadline
+            ]
+            for cl in inactive:
+                # Take connection out of the pool while it is closing
+                self._free.remove(cl)
+                await cl.close()
+                if len(self._clients) > self._min_size:
+                    self._clients.remove(cl)
+                else:
+                    self._free.put(cl)
+
     def acquire(self):
         return PoolObjContext(self)
 
-    async def _acquire(self):
+    async def borrow(self):
+        """ Take connection from the pool, it should be given back with ``release`` """
         self._check_inited()
-        cl = await self._queue.get()
+        if self._batcher is not None:
+            return self._batcher
+        if self._free:
+            # Warm pool: plain deque pop, no coroutine is created or awaited
+            cl = self._free.take_nowait()
+        elif len(self._clients) < self._max_size:
+            cl = self._new_connection()
+            try:
+                await cl.connect()
+            except BaseException:
+                # Cancelled borrow must give its slot back as well
+                self._clients.remove(cl)
+                raise
+        else:
+            cl = await self._free.take()
         cl._acquired = True
-        logging.debug(f"{cl} popped")
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug("%s popped", cl)
         return cl
 
     def release(self, entity):
         self._check_inited()
-        self._queue.put_nowait(entity)
+        # Connection closed inside "async with" is already released
+        if entity is self._batcher or not entity._acquired:
+            return
         entity._acquired = False
-        logging.debug(f"{entity} released")
+        self._free.put(entity)
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug("%s released", entity)
+
+    def _new_connection(self):
+        cl = Connection(
+            host=self._host,
+            port=self._port,
+            pool=self,
+            inactive_time=self._inactive_time,
+        )
+        cl._acquired = False
+        self._clients.append(cl)
+        return cl
 
     async def close(self):
-        logging.debug(f"Start closing {self}..")
+        _log.debug("Start closing %s..", self)
         self._check_inited()
-        coros = [cl.close() for cl in self._clients]
-        await asyncio.gather(*coros, loop=self._loop)
+        if self._reaper is not None:
+            self._reaper.cancel()
+        await self._for_each_client(Connection.close)
         self._closed = True
-        logging.debug(f"Done closing {self}")
+        _log.debug("Done closing %s", self)
+
+    async def _for_each_client(self, method):
+        # Large pools do not open or close all sockets at once
+        sem = asyncio.Semaphore(self._max_concurrency)
+
+        async def run(cl):
+            async with sem:
+                await method(cl)
+
+        # One failure must not cancel the rest, e.g. other closes
+        results = await asyncio.gather(*map(run, self._clients), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
 
     def _check_inited(self):
         if not self._inited:
@@ -133,6 +260,53 @@ class ConnectionPool:
         return f"<Pool {id(self)}>"
 
 
+class _StackPool:
+    """
+    Stack of free items with a queue of waiting takers: the most recently
+    put item is taken first (LIFO) and takers are served in FIFO order.
+    """
+
+    __slots__ = "_loop", "_items", "_waiters"
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._items = deque()
+        self._waiters = deque()
+
+    def put(self, item):
+        # Hand item to the oldest taker still waiting for it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(item)
+                return
+        self._items.append(item)
+
+    def take_nowait(self):
+        return self._items.pop()
+
+    async def take(self):
+        if self._items:
+            return self._items.pop()
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.put(waiter.result())
+            raise
+
+    def remove(self, item):
+        self._items.remove(item)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
 class PoolObjContext:
 
     __slots__ = "pool", "pool_obj"
@@ -142,14 +316,90 @@ class PoolObjContext:
         self.pool_obj = None
 
     async def __aenter__(self):
-        self.pool_obj = await self.pool._acquire()
+        self.pool_obj = await self.pool.borrow()
         return self.pool_obj
 
     async def __aexit__(self, *exc):
-        await self.pool_obj.close()
+        # Connection goes back to the pool still connected
+        self.pool.release(self.pool_obj)
 
     def __await__(self):
-        return self.pool._acquire().__await__()
+        return self.pool.borrow().__await__()
+
+
+class AutoBatcher(CommandsMixin):
+
+    __slots__ = ("connection", "max_size", "_loop", "_pending", "_flushing")
+
+    def __init__(self, connection, max_size=50):
+        """
+        Shares one connection between many coroutines: commands executed
+        during the same event loop tick are sent as one pipelined batch and
+        every caller gets its own response back.
+
+        Usage:
+
+        .. code-block:: python
+
+            async with ConnectionPool(auto_batch=True) as pool:
+                async with pool.acquire() as con:  # type: AutoBatcher
+                    assert await con.ping() == 'PONG'
+
+        :param connection:
+            Connection to send batches with.
+
+        :param max_size:
+            Maximum number of commands in one batch.
+        """
+        self.connection = connection
+        self.max_size = max_size
+        self._loop = connection._loop
+        self._pending = []
+        self._flushing = None
+
+    def _enqueue(self, args):
+        fut = self._loop.create_future()
+        self._pending.append((args, fut))
+        if self._flushing is None:
+            # Flush on the next tick so that concurrent callers
+            # get into the same batch
+            self._flushing = asyncio.ensure_future(self._flush())
+        return fut
+
+    async def _flush(self):
+        try:
+            # Commands enqueued while a batch is in flight
+            # are sent right after its responses are read
+            while self._pending:
+                batch = self._pending[: self.max_size]
+                del self._pending[: self.max_size]
+                try:
+                    responses = await self.connection.execute_many(
+                        *(args for args, _ in batch)
+                    )
+                except Exception as e:
+                    for _, fut in batch:
+                        if not fut.done():
+                            fut.set_exception(e)
+                else:
+                    for (_, fut), resp in zip(batch, responses):
+                        if not fut.done():
+                            fut.set_result(resp)
+        finally:
+            self._flushing = None
+
+    async def execute(self, *args):
+        return await self._enqueue(args)
+
+    async def execute_many(self, *commands):
+        return list(await asyncio.gather(*map(self._enqueue, commands)))
+
+    async def close(self):
+        # Shared connection is owned by the pool and closed with it
+        pass
+
+    def __repr__(self):
+        return f"<AutoBatcher {id(self)} {self.connection}>"
 
 
 class Connection(CommandsMixin):
@@ -157,16 +407,23 @@ class Connection(CommandsMixin):
     __slots__ = (
         "host",
         "port",
-        "_stream",
+        "_reader",
+        "_writer",
         "_pool",
         "_connected",
-        "_waiting",
+        "_last_used",
+        "_inactive_handle",
         "_inactive_time",
         "_loop",
         "_acquired",
+        "_parser",
         "try_reconnect",
     )
 
+    # Limit of the StreamReader buffer created on every (re)connect:
+    # typical replies are tiny, so it is sized for small-command workloads
+    _reader_buf_limit = 8192
+
     def __init__(
         self,
         host="127.0.0.1",
@@ -213,75 +470,78 @@ class Connection(CommandsMixin):
         """
         self.host = host
         self.port = port
-        self._stream = None
+        self._reader = None
+        self._writer = None
         self._pool = pool
         self._connected = False
-        self._waiting = None
+        self._inactive_handle = None
         self._inactive_time = inactive_time
         self._loop: asyncio.BaseEventLoop = (
             self._pool._loop if self._pool else loop or asyncio.get_event_loop()
         )
+        self._last_used = self._loop.time()
         self._acquired = None
+        self._parser = None
         self.try_reconnect = try_reconnect
 
     async def connect(self):
-        self._cancel_inactive()
-        self._stream = Stream(
-            *await asyncio.open_connection(self.host, self.port, loop=self._loop)
+        self._reader, self._writer = await _open_connection(
+            self.host, self.port, self._loop, self._reader_buf_limit
         )
+        self._parser = RESPParser()
         self._connected = True
-        self._wait_inactive()
-        logging.debug(f"{self} connected")
-
-    async def _cancel_task(self):
-        if self._inactive_time:
-            await asyncio.sleep(self._inactive_time)
-            await self.close()
-
-    def _wait_inactive(self):
-        if self._waiting is None or self._waiting.cancelled() or self._waiting.done():
-            self._waiting = asyncio.ensure_future(self._cancel_task())
-
-    def _cancel_inactive(self):
-        if (
-            self._waiting is not None
-            and not self._waiting.done()
-            and not self._waiting.cancelled()
-        ):
-            self._waiting.cancel()
+        self._last_used = self._loop.time()
+        # Pooled connections are closed by the pool sweeper
+        if self._inactive_time and not self._pool and self._inactive_handle is None:
+            self._inactive_handle = self._loop.call_later(
+                self._inactive_time, self._check_inactive
+            )
+        _log.debug("%s connected", self)
+
+    def _check_inactive(self):
+        # Timer is re-armed only when it fires, not on every command
+        idle = self._loop.time() - self._last_used
+        if idle >= self._inactive_time:
+            self._inactive_handle = None
+            asyncio.ensure_future(self.close())
+        else:
+            self._inactive_handle = self._loop.call_later(
+                self._inactive_time - idle, self._check_inactive
+            )
 
     async def close(self):
-        self._cancel_inactive()
-        logging.debug(f"{self} start closing")
+        if self._inactive_handle is not None:
+            self._inactive_handle.cancel()
+            self._inactive_handle = None
+        _log.debug("%s start closing", self)
         if self._connected:
             await self.execute(b"QUIT")
             # We should release connection from here because we have
             # case of usage from pool without "async with" statement
             if self._pool and self._acquired:
                 self._pool.release(self)
-            self._stream = None
+            self._reader = self._writer = None
             self._connected = False
-        if self._waiting is not None:
-            try:
-                await self._waiting
-            except asyncio.CancelledError:
-                pass
-        logging.debug(f"{self} closed")
+        _log.debug("%s closed", self)
 
     async def execute(self, *args):
-        self._cancel_inactive()
         if not self._connected:
             await self.connect()
         try:
-            await process_writer(self._stream.writer, args)
+            writer = self._writer
+            writer.write(serialize(args))
+            # Reply can be awaited right away unless the transport is backed up
+            if writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+                await writer.drain()
             if args[0] == b"QUIT":
                 resp = None
-                self._stream.writer.close()
+                writer.close()
+                self._connected = False
             else:
-                resp = await process_reader(self._stream.reader)
-                self._wait_inactive()
+                resp = await process_reader(self._reader, self._parser)
+                self._last_used = self._loop.time()
         except RadishConnectionError as e:
-            logging.error("Connection Error: %s", e.msg)
+            _log.error("Connection Error: %s", e.msg)
             if self._pool:
                 await self._pool.close()
             raise RadishClientError(e.msg)
@@ -295,6 +555,44 @@ class Connection(CommandsMixin):
         else:
             return resp
 
+    async def execute_many(self, *commands):
+        """
+        Pipeline several commands: all of them are sent with one write
+        and their responses are read back in the same order.
+
+        :param commands:
+            Sequences of command arguments, like ``(b"SET", "key", "val")``.
+            Batch is split at QUIT: server sends nothing back for it and
+            commands after it go through a new connection.
+        """
+        for i, command in enumerate(commands):
+            if command[0] == b"QUIT":
+                head = await self.execute_many(*commands[:i]) if i else []
+                await self.execute(*command)
+                return head + [None] + await self.execute_many(*commands[i + 1 :])
+        if not commands:
+            return []
+        if not self._connected:
+            await self.connect()
+        try:
+            await process_writer_many(self._writer, commands)
+            resp = [await process_reader(self._reader, self._parser) for _ in commands]
+            self._last_used = self._loop.time()
+        except RadishConnectionError as e:
+            _log.error("Connection Error: %s", e.msg)
+            if self._pool:
+                await self._pool.close()
+            raise RadishClientError(e.msg)
+        except ConnectionError as e:
+            if self.try_reconnect:
+                self._connected = False
+                return await self.execute_many(*commands)
+            if self._pool:
+                await self._pool.close()
+            raise e
+        else:
+            return resp
+
     async def __aenter__(self):
         await self.connect()
         return self
@@ -304,3 +602,126 @@ class Connection(CommandsMixin):
 
     def __repr__(self):
         return f'<Connection {id(self)} {self._pool if self._pool else ""}>'
+
+
+class PipelinedConnection(Connection):
+
+    __slots__ = ("_pending", "_reader_task", "_connect_lock")
+
+    def __init__(self, *args, **kwargs):
+        """
+        Connection shared by many coroutines: every ``execute`` writes its
+        command right away and a background task reads responses back,
+        so any number of commands can be in flight on one socket.
+
+        Usage:
+
+        .. code-block:: python
+
+            async with PipelinedConnection(host='127.0.0.1', port=7272) as con:
+                assert await asyncio.gather(con.ping(), con.echo(1)) == ['PONG', 1]
+
+        Takes the same arguments as :class:`Connection`. With ``try_reconnect``
+        commands lost with a dropped connection are sent again over a new one,
+        but only once per call.
+        """
+        super().__init__(*args, **kwargs)
+        # Futures of sent commands in the order their responses will come
+        self._pending = deque()
+        self._reader_task = None
+        # Concurrent callers of a disconnected connection open only one socket
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self._connected:
+                return
+            await super().connect()
+            self._pending = deque()
+            self._reader_task = self._loop.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        # Only this task reads from the socket, so no timeout is needed
+        # while the connection is idle
+        reader, writer = self._reader, self._writer
+        parser, pending = self._parser, self._pending
+        try:
+            while True:
+                resp = parser.parse_one()
+                if resp is NEED_MORE:
+                    data = await reader.read(READ_SIZE)
+                    if not data:
+                        raise RadishConnectionError("Connection closed")
+                    parser.feed(data)
+                    continue
+                if not pending:
+                    raise RadishConnectionError("Unexpected response")
+                self._last_used = self._loop.time()
+                fut = pending.popleft()
+                if not fut.done():
+                    fut.set_result(resp)
+        except (RadishError, ConnectionError) as e:
+            if pending or not isinstance(e, RadishConnectionError):
+                _log.error("Connection Error: %s", getattr(e, "msg", e))
+            if reader is self._reader:
+                self._connected = False
+            writer.close()
+            while pending:
+                fut = pending.popleft()
+                if not fut.done():
+                    fut.set_exception(ConnectionResetError("Connection lost"))
+
+    async def _quit(self):
+        writer, pending, reader_task = self._writer, self._pending, self._reader_task
+        self._connected = False
+        writer.write(b"*1\r\n$4\r\nQUIT\r\n")
+        # Commands sent before QUIT are still answered by the server
+        if pending:
+            await asyncio.wait(list(pending))
+        reader_task.cancel()
+        writer.close()
+
+    async def execute(self, *args):
+        if args[0] == b"QUIT":
+            if not self._connected:
+                await self.connect()
+            return await self._quit()
+        # Lost command is sent again only once: server may drop every connection
+        retries = 1 if self.try_reconnect else 0
+        while True:
+            if not self._connected:
+                await self.connect()
+            fut = self._loop.create_future()
+            self._pending.append(fut)
+            writer = self._writer
+            writer.write(serialize(args))
+            if writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+                await writer.drain()
+            try:
+                return await fut
+            except ConnectionError as e:
+                if not retries:
+                    raise RadishClientError(str(e))
+                retries -= 1
+
+    async def execute_many(self, *commands):
+        if any(command[0] == b"QUIT" for command in commands):
+            return [await self.execute(*command) for command in commands]
+        if not commands:
+            return []
+        retries = 1 if self.try_reconnect else 0
+        while True:
+            if not self._connected:
+                await self.connect()
+            futures = [self._loop.create_future() for _ in commands]
+            self._pending.extend(futures)
+            await process_writer_many(self._writer, commands)
+            try:
+                return list(await asyncio.gather(*futures))
+            except ConnectionError as e:
+                if not retries:
+                    raise RadishClientError(str(e))
+                retries -= 1
+
+    def __repr__(self):
+        return f"<PipelinedConnection {id(self)}>"
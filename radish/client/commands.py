@@ -6,9 +6,15 @@ from radish.exceptions import RadishClientError
 class CommandsMixin:
     """ Mixin for executing commands with high level interface """
 
+    # Empty slots keep subclasses' instances without __dict__
+    __slots__ = ()
+
     async def execute(self, *_):
         raise NotImplementedError
 
+    async def execute_many(self, *_):
+        raise NotImplementedError
+
     async def get(self, key):
         return await self.execute(b"GET", key)
 
@@ -1,73 +1,133 @@
 import logging
 import asyncio
-
-from radish.protocol import Error, process_reader, process_writer
+from contextlib import suppress
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from radish.protocol import (
+    CLIENT_CONNECTION_TIMEOUT,
+    NEED_MORE,
+    RESPParser,
+    encode_into,
+    error_frame,
+)
 from radish.exceptions import RadishBadRequest, RadishConnectionError
 
 from .storage import RadishStore
 
+_log = logging.getLogger(__name__)
+
+
+def _default_loop():
+    """ Running loop if there is one, otherwise uvloop when it is installed """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    if uvloop is None:
+        return asyncio.get_event_loop()
+    loop = uvloop.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
 
-class Handler:
+
+class Handler(asyncio.Protocol):
 
     __slots__ = (
         "server",
-        "reader",
-        "writer",
-        "closing_delay",
+        "transport",
+        "parser",
+        "last_active",
         "_active",
-        "_wait_closed",
+        "_paused",
         "address",
     )
 
-    def __init__(
-        self,
-        server: "Server",
-        reader: asyncio.StreamReader,
-        writer: asyncio.StreamWriter,
-        closing_delay: int = None,
-    ):
+    def __init__(self, server: "Server"):
+        """
+        Serves one client connection: requests are parsed straight from
+        received chunks and all replies to a chunk are written at once.
+        """
         self.server = server
-        self.reader = reader
-        self.writer = writer
-        self.closing_delay = closing_delay
-        self._active = None
-        self._wait_closed = None
-        self.address = self.writer.get_extra_info("peername")
-
-    async def run(self):
+        self.transport = None
+        self.parser = RESPParser()
+        self.last_active = server.loop.time()
+        self._active = False
+        self._paused = False
+        self.address = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+        self.address = transport.get_extra_info("peername")
         self._active = True
-        while self._active:
+        self.server._connection_made(self)
+
+    def connection_lost(self, exc):
+        self._active = False
+        self.server._connection_lost(self)
+
+    def pause_writing(self):
+        # Client does not read its replies, stop reading its requests
+        self._paused = True
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        # Time spent paused is not idle time of the client
+        self._paused = False
+        self.last_active = self.server.loop.time()
+        self.transport.resume_reading()
+
+    def data_received(self, data: bytes):
+        # hot loop works with local names only
+        parser, address = self.parser, self.address
+        # Replies to the whole chunk are collected and written at once
+        outbuf = bytearray()
+        parse_one, need_more = parser.parse_one, NEED_MORE
+        process_request = self.server.storage.process_request
+        encode, error = encode_into, error_frame
+        debug = _log.debug
+        self.last_active = self.server.loop.time()
+        parser.feed(data)
+        quit_ = False
+        while True:
             try:
-                self._wait_inactive()
-                request = await process_reader(self.reader)
-                self._cancel_inactive()
-                logging.debug(f"Got request from {self.address}: {request}")
-                if not isinstance(request, list):
+                request = parse_one()
+                if request is need_more:
+                    break
+                debug("Got request from %s: %s", address, request)
+                if (
+                    type(request) is not list
+                    or not request
+                    or type(request[0]) is not bytes
+                ):
                     raise RadishBadRequest("Bad request format")
-                answer = self.server.storage.process_command(*request)
+                answer = process_request(request)
             except RadishBadRequest as e:
-                answer = Error(e.msg)
-            except (RadishConnectionError, ConnectionError):
-                self.close_connection()
+                debug("Sent error to %s: %s", address, e.msg)
+                outbuf += error(e.msg)
+                continue
+            except TypeError:
+                # e.g. unhashable key: fail the request, not the connection
+                debug("Sent error to %s: wrong argument type", address)
+                outbuf += error("Wrong type of argument")
+                continue
+            except RadishConnectionError:
+                quit_ = True
                 break
-            logging.debug(f"Sent response to {self.address}: {answer}")
-            await process_writer(self.writer, answer)
-
-    def _wait_inactive(self):
-        if self.closing_delay and self._wait_closed is None:
-            self._wait_closed = self.server.loop.call_later(
-                self.closing_delay, self.close_connection
-            )
-
-    def _cancel_inactive(self):
-        if self._wait_closed:
-            self._wait_closed.cancel()
-            self._wait_closed = None
+            debug("Sent response to %s: %s", address, answer)
+            encode(outbuf, answer)
+        if outbuf:
+            self.transport.write(outbuf)
+        if quit_:
+            self.close_connection()
 
     def close_connection(self):
         if self._active:
-            self.writer.close()
-            logging.debug(f"Connection from  {self.address} CLOSED")
+            self.transport.close()
+            _log.debug("Connection from %s CLOSED", self.address)
             self._active = False
 
 
@@ -78,8 +138,11 @@ class Server:
         "port",
         "storage",
         "closing_delay",
+        "reuse_port",
         "loop",
         "active_connections",
+        "_handlers",
+        "_sweeper",
     )
 
     def __init__(
@@ -89,38 +152,69 @@ class Server:
         storage: RadishStore = None,
         loop=None,
         closing_delay=None,
+        reuse_port=False,
     ):
+        """
+        Radish DB server.
+
+        :param reuse_port:
+            Bind with SO_REUSEPORT, so that several independent server
+            processes can share one port. Every process has its own storage:
+            clients should route keys to processes themselves.
+        """
         self.host = host
         self.port = port
         self.storage = storage or RadishStore()
         self.closing_delay = closing_delay
-        self.loop: asyncio.BaseEventLoop = loop or asyncio.get_event_loop()
+        self.reuse_port = reuse_port
+        self.loop: asyncio.BaseEventLoop = loop or _default_loop()
         self.active_connections = 0
+        self._handlers = set()
+        self._sweeper = None
 
-    async def _start_new_handler(
-        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
-    ):
-        handler = Handler(
-            self, reader=reader, writer=writer, closing_delay=self.closing_delay
-        )
+    def _new_handler(self) -> Handler:
+        return Handler(self)
 
+    def _connection_made(self, handler: Handler):
         self.active_connections += 1
-        logging.info(
-            f'New connection: {writer.get_extra_info("peername")}'
-            f" | Total: {self.active_connections} connections"
+        _log.info(
+            "New connection: %s | Total: %s connections",
+            handler.address,
+            self.active_connections,
         )
+        self._handlers.add(handler)
+        if self._sweeper is None:
+            self._sweeper = self.loop.create_task(self._close_inactive())
 
-        await handler.run()
-
+    def _connection_lost(self, handler: Handler):
+        self._handlers.discard(handler)
         self.active_connections -= 1
-        logging.info(
-            f'Connection finished: {writer.get_extra_info("peername")}'
-            f" | Total: {self.active_connections} connections"
+        _log.info(
+            "Connection finished: %s | Total: %s connections",
+            handler.address,
+            self.active_connections,
         )
 
+    async def _close_inactive(self):
+        """ One sweeper for all handlers instead of a timer per request """
+        # Without closing_delay idle clients are dropped after the default timeout
+        closing_delay = self.closing_delay or CLIENT_CONNECTION_TIMEOUT
+        try:
+            while self._handlers:
+                await asyncio.sleep(closing_delay / 2)
+                deadline = self.loop.time() - closing_delay
+                for handler in [
+                    h
+                    for h in self._handlers
+                    if h.last_active < deadline and not h._paused
+                ]:
+                    handler.close_connection()
+        finally:
+            self._sweeper = None
+
     def run(self):
-        coro = asyncio.start_server(
-            self._start_new_handler, self.host, self.port, loop=self.loop
+        coro = self.loop.create_server(
+            self._new_handler, self.host, self.port, reuse_port=self.reuse_port or None
         )
         server = self.loop.run_until_complete(coro)
 
@@ -144,4 +238,9 @@ class Server:
         finally:
             server.close()
             self.loop.run_until_complete(server.wait_closed())
+            sweeper = self._sweeper
+            if sweeper is not None:
+                sweeper.cancel()
+                with suppress(asyncio.CancelledError):
+                    self.loop.run_until_complete(sweeper)
             self.loop.close()
@@ -1,7 +1,15 @@
+from itertools import islice
+
 from radish.exceptions import RadishBadRequest, RadishConnectionError
 
 
 class RadishStore:
+    """
+    Requests are executed by ``_<command>(request)`` handlers taking the whole
+    parsed request (command name first). Public methods like ``get`` or ``set``
+    are wrappers for direct calls: subclasses changing command behaviour
+    should override the handlers, e.g. ``_get``, to affect the server too.
+    """
 
     __slots__ = "_store", "commands"
 
@@ -12,87 +20,137 @@ class RadishStore:
         :param store_obj: dict like obj for storing storage values
         """
         self._store = store_obj or {}
+        # Command handlers take the whole parsed request: command name
+        # followed by its arguments, so it is never unpacked and repacked
         self.commands = {
-            b"GET": self.get,
-            b"SET": self.set,
-            b"DEL": self.delete,
-            b"FLUSHDB": self.flush,
-            b"EXISTS": self.exists,
-            b"ECHO": self.echo,
-            b"PING": self.ping,
-            b"QUIT": self.quit,
-            b"MGET": self.mget,
-            b"MSET": self.mset,
-            b"STRLEN": self.strlen,
+            b"GET": self._get,
+            b"SET": self._set,
+            b"DEL": self._delete,
+            b"FLUSHDB": self._flush,
+            b"EXISTS": self._exists,
+            b"ECHO": self._echo,
+            b"PING": self._ping,
+            b"QUIT": self._quit,
+            b"MGET": self._mget,
+            b"MSET": self._mset,
+            b"STRLEN": self._strlen,
         }
+        # lowercase and title case aliases, so usual spellings of commands
+        # are found without upper()
+        for name, method in list(self.commands.items()):
+            self.commands[name.lower()] = method
+            self.commands[name.title()] = method
+
+    def process_request(self, request: list):
+        """ Execute parsed non-empty request: ``[command, *args]`` """
+        commands = self.commands
+        method = commands.get(request[0])
+        if method is None:
+            method = commands.get(request[0].upper())
+            if method is None:
+                raise RadishBadRequest("Bad command")
+        return method(request)
 
     def process_command(self, command, *args):
-        try:
-            return self.commands[command.upper()](*args)
-        except KeyError:
-            raise RadishBadRequest("Bad command")
+        return self.process_request([command, *args])
 
     def get(self, *args):
-        if len(args) != 1:
-            raise RadishBadRequest("Wrong number of arguments for GET")
-        return self._store.get(args[0])
+        return self._get((b"GET", *args))
 
     def set(self, *args):
-        if len(args) != 2:
-            raise RadishBadRequest("Wrong number of arguments for SET")
-        self._store[args[0]] = args[1]
-        return 1
+        return self._set((b"SET", *args))
 
     def delete(self, *args):
-        if len(args) != 1:
+        return self._delete((b"DEL", *args))
+
+    def flush(self):
+        return self._flush((b"FLUSHDB",))
+
+    def exists(self, *args):
+        return self._exists((b"EXISTS", *args))
+
+    def echo(self, *args):
+        return self._echo((b"ECHO", *args))
+
+    def ping(self, *args):
+        return self._ping((b"PING", *args))
+
+    def quit(self, *args):
+        return self._quit((b"QUIT", *args))
+
+    def mset(self, *args):
+        return self._mset((b"MSET", *args))
+
+    def mget(self, *args):
+        return self._mget((b"MGET", *args))
+
+    def strlen(self, *args):
+        return self._strlen((b"STRLEN", *args))
+
+    def _get(self, request):
+        if len(request) != 2:
             raise RadishBadRequest("Wrong number of arguments for GET")
+        return self._store.get(request[1])
+
+    def _set(self, request):
+        if len(request) != 3:
+            raise RadishBadRequest("Wrong number of arguments for SET")
+        self._store[request[1]] = request[2]
+        return 1
+
+    def _delete(self, request):
+        if len(request) != 2:
+            raise RadishBadRequest("Wrong number of arguments for DEL")
         try:
-            del self._store[args[0]]
+            del self._store[request[1]]
             return 1
         except KeyError:
             return 0
 
-    def flush(self):
+    def _flush(self, request):
+        if len(request) != 1:
+            raise RadishBadRequest("Wrong number of arguments for FLUSHDB")
         store_len = len(self._store)
         self._store.clear()
         return store_len
 
-    def exists(self, *args):
-        if not args:
+    def _exists(self, request):
+        if len(request) < 2:
             raise RadishBadRequest("Wrong number of arguments for EXISTS")
-        return sum(key in self._store for key in args)
+        if len(request) == 2:
+            return 1 if request[1] in self._store else 0
+        return sum(map(self._store.__contains__, islice(request, 1, None)))
 
-    def echo(self, *args):
-        if len(args) != 1:
+    def _echo(self, request):
+        if len(request) != 2:
             raise RadishBadRequest("Wrong number of arguments for ECHO")
-        return args[0]
+        return request[1]
 
-    def ping(self, *args):
-        if len(args) != 1:
+    def _ping(self, request):
+        if len(request) != 2:
             return "PONG"
-        return args[0]
+        return request[1]
 
-    def quit(self, *args):
+    def _quit(self, request):
         raise RadishConnectionError("QUIT command")
 
-    def mset(self, *args):
-        if not args or len(args) % 2:
+    def _mset(self, request):
+        if len(request) < 3 or len(request) % 2 == 0:
             raise RadishBadRequest("Wrong number of arguments for MSET")
-        lst_it = iter(args)
-        for key, val in zip(lst_it, lst_it):
-            self.set(key, val)
+        lst_it = islice(request, 1, None)
+        self._store.update(zip(lst_it, lst_it))
         return "OK"
 
-    def mget(self, *args):
-        if not args:
+    def _mget(self, request):
+        if len(request) < 2:
             raise RadishBadRequest("Wrong number of arguments for MGET")
-        return [self._store.get(key) for key in args]
+        return list(map(self._store.get, islice(request, 1, None)))
 
-    def strlen(self, *args):
-        if len(args) != 1:
+    def _strlen(self, request):
+        if len(request) != 2:
             raise RadishBadRequest("Wrong number of arguments for STRLEN")
         try:
-            return len(self._store[args[0]])
+            return len(self._store[request[1]])
         except KeyError:
             return 0
         except TypeError:
@@ -1,6 +1,7 @@
 from typing import Union
 import asyncio
 from collections import namedtuple
+from functools import lru_cache
 
 from radish.exceptions import (
     RadishBadRequest,
@@ -8,84 +9,344 @@ from radish.exceptions import (
     RadishProtocolError,
 )
 
-__all__ = ["process_reader", "process_writer"]
+__all__ = [
+    "RESPParser",
+    "encode_into",
+    "error_frame",
+    "process_reader",
+    "process_writer",
+    "process_writer_many",
+    "serialize",
+]
 
 
 Error = namedtuple("Error", ["message"])
 
 CLIENT_CONNECTION_TIMEOUT = 300
 
+# Pre-encoded integer frames for small numbers
+_INT_CACHE_MIN = -256
+_INT_CACHE = tuple(b":%d\r\n" % i for i in range(_INT_CACHE_MIN, 1024))
 
-async def process_reader(reader: asyncio.StreamReader):
-    try:
-        command = await asyncio.wait_for(reader.read(1), CLIENT_CONNECTION_TIMEOUT)
-    except asyncio.TimeoutError:
-        raise RadishConnectionError("Timeout error")
-    if not command:
-        raise RadishConnectionError("Empty request")
-    try:
-        return await {
-            b"-": _process_error,
-            b":": _process_integer,
-            b"$": _process_byte_string,
-            b"+": _process_utf_string,
-            b"*": _process_array,
-        }[command](reader)
-    except KeyError:
-        raise RadishBadRequest("Bad first byte")
+# Pre-encoded headers of arrays, bytes and str frames for short values
+_HEADER_CACHE_SIZE = 1024
+_ARRAY_HEADERS = tuple(b"*%d\r\n" % n for n in range(_HEADER_CACHE_SIZE))
+_BYTES_HEADERS = tuple(b"$%d\r\n" % n for n in range(_HEADER_CACHE_SIZE))
+_STR_HEADERS = tuple(b"+%d\r\n" % n for n in range(_HEADER_CACHE_SIZE))
 
+# Pre-encoded frames of constant string replies
+_STR_FRAMES = {"OK": b"+2\r\nOK\r\n", "PONG": b"+4\r\nPONG\r\n"}
 
-async def _process_error(reader: asyncio.StreamReader):
-    return Error((await reader.readline()).strip())
+# Pre-encoded request prefixes (array header + command verb) by number of
+# request elements, so that only arguments are encoded for known commands
+_REQUEST_PREFIXES = {
+    verb: tuple(b"*%d\r\n$%d\r\n%s\r\n" % (n, len(verb), verb) for n in range(16))
+    for verb in (
+        b"GET",
+        b"SET",
+        b"DEL",
+        b"FLUSHDB",
+        b"EXISTS",
+        b"ECHO",
+        b"PING",
+        b"QUIT",
+        b"MGET",
+        b"MSET",
+        b"STRLEN",
+    )
+}
 
 
-async def _process_integer(reader: asyncio.StreamReader):
-    return int((await reader.readline()).strip())
+# Max number of bytes read from socket at once
+READ_SIZE = 8192
 
+# Write buffer size after which writers should wait for it to drain
+WRITE_BUFFER_HIGH_WATER = 65536
 
-async def _process_byte_string(reader: asyncio.StreamReader):
-    length = int((await reader.readline()).strip())
-    if length == -1:
-        return None
-    return (await reader.read(length + 2))[:-2]
+NEED_MORE = object()
 
 
-async def _process_utf_string(reader: asyncio.StreamReader):
-    return (await _process_byte_string(reader)).decode()
+class _NeedMore(Exception):
+    """ Buffered data ends in the middle of a message """
 
+    def __init__(self, size: int):
+        # Buffer size needed before parsing should be tried again
+        self.size = size
 
-async def _process_array(reader: asyncio.StreamReader):
-    num_elements = int((await reader.readline()).strip())
-    if num_elements == -1:
-        return [None]
-    if num_elements < 0:
-        raise RadishBadRequest("Bad array length")
-    return [(await process_reader(reader)) for _ in range(num_elements)]
+
+class RESPParser:
+
+    __slots__ = ("buf", "_pos", "_chunks", "_size", "_needed", "_arrays")
+
+    def __init__(self):
+        """
+        Incremental parser: socket data is fed to it in chunks as it comes
+        and whole messages are parsed synchronously out of the buffer.
+        """
+        self.buf = b""
+        # Parsed messages are not cut off the buffer, only skipped
+        self._pos = 0
+        self._chunks = []
+        self._size = 0
+        self._needed = 0
+        # (items, remaining count) of arrays being parsed, outermost first:
+        # parsing of a message split between chunks goes on where it stopped
+        self._arrays = []
+
+    def feed(self, data: bytes):
+        # Chunks are joined only once there is enough data to parse,
+        # so big messages are not copied on every read
+        self._chunks.append(data)
+        self._size += len(data)
+
+    def parse_one(self):
+        """ Parse next buffered message or return ``NEED_MORE`` """
+        if self._size < self._needed:
+            return NEED_MORE
+        if self._chunks:
+            if self._pos < len(self.buf):
+                self._chunks.insert(0, self.buf[self._pos :] if self._pos else self.buf)
+            if len(self._chunks) == 1:
+                self.buf = self._chunks[0]
+            else:
+                self.buf = b"".join(self._chunks)
+            self._chunks.clear()
+            self._pos = 0
+            self._size = len(self.buf)
+        try:
+            msg, pos = self._parse(self.buf, self._pos)
+        except _NeedMore as e:
+            self._needed = e.size
+            return NEED_MORE
+        except ValueError:
+            # Stream can not be trusted after malformed data
+            self._reset()
+            raise RadishBadRequest("Bad message format")
+        except RadishBadRequest:
+            self._reset()
+            raise
+        if pos == len(self.buf):
+            self.buf = b""
+            self._pos = self._size = 0
+        else:
+            self._pos = pos
+        self._needed = 0
+        return msg
+
+    def _reset(self):
+        self.buf = b""
+        self._chunks.clear()
+        self._arrays.clear()
+        self._pos = self._size = self._needed = 0
+
+    def _parse(self, buf: bytes, pos: int):
+        # Innermost array being parsed is kept in locals, outer ones in arrays
+        arrays = self._arrays
+        items, remaining = arrays.pop() if arrays else (None, 0)
+        while True:
+            end = buf.find(b"\r\n", pos)
+            if end == -1:
+                # Complete items are kept, only the rest is parsed again
+                if items is not None:
+                    arrays.append((items, remaining))
+                self._pos = pos
+                raise _NeedMore(len(buf) + 1)
+            first_byte = buf[pos]
+            if first_byte == 42:  # "*"
+                # Counts and lengths are mostly single digits: no slice and int()
+                digit = buf[pos + 1] - 48
+                if end - pos == 2 and 0 <= digit <= 9:
+                    num_elements = digit
+                else:
+                    num_elements = int(buf[pos + 1 : end])
+                pos = end + 2
+                if num_elements > 0:
+                    if items is not None:
+                        arrays.append((items, remaining))
+                    items, remaining = [], num_elements
+                    continue
+                if num_elements == -1:
+                    item = [None]
+                elif num_elements == 0:
+                    item = []
+                else:
+                    raise RadishBadRequest("Bad array length")
+            elif first_byte == 36 or first_byte == 43:  # "$" or "+"
+                digit = buf[pos + 1] - 48
+                if end - pos == 2 and 0 <= digit <= 9:
+                    length = digit
+                else:
+                    length = int(buf[pos + 1 : end])
+                if length == -1:
+                    item = None
+                    pos = end + 2
+                else:
+                    if len(buf) < end + length + 4:
+                        if items is not None:
+                            arrays.append((items, remaining))
+                        self._pos = pos
+                        raise _NeedMore(end + length + 4)
+                    item = buf[end + 2 : end + 2 + length]
+                    if first_byte == 43:
+                        item = item.decode()
+                    pos = end + length + 4
+            elif first_byte == 58:  # ":"
+                item, pos = int(buf[pos + 1 : end]), end + 2
+            elif first_byte == 45:  # "-"
+                item, pos = Error(buf[pos + 1 : end].strip()), end + 2
+            else:
+                raise RadishBadRequest("Bad first byte")
+            # Put complete item into its array, finishing full arrays
+            while items is not None:
+                items.append(item)
+                remaining -= 1
+                if remaining:
+                    break
+                item = items
+                items, remaining = arrays.pop() if arrays else (None, 0)
+            else:
+                return item, pos
+
+
+async def process_reader(reader: asyncio.StreamReader, parser: RESPParser):
+    # Socket is read by big chunks and all messages from a chunk
+    # are parsed without waiting on the reader again
+    msg = parser.parse_one()
+    while msg is NEED_MORE:
+        try:
+            data = await asyncio.wait_for(
+                reader.read(READ_SIZE), CLIENT_CONNECTION_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise RadishConnectionError("Timeout error")
+        if not data:
+            raise RadishConnectionError("Empty request")
+        parser.feed(data)
+        msg = parser.parse_one()
+    return msg
 
 
 async def process_writer(
     writer: asyncio.StreamWriter, data: Union[bytes, str, int, Error, list, tuple, None]
 ):
-    _write_response(writer, data)
-    await writer.drain()
+    buf = bytearray()
+    _encode(buf, data)
+    writer.write(buf)
+    if writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+        await writer.drain()
 
 
-def _write_response(
-    writer: asyncio.StreamWriter, data: Union[bytes, str, int, Error, list, tuple, None]
-):
-    if isinstance(data, bytes):
-        writer.write(b"$%d\r\n%s\r\n" % (len(data), data))
+async def process_writer_many(writer: asyncio.StreamWriter, commands):
+    """ Write several frames with one ``write`` call """
+    buf = bytearray()
+    for command in commands:
+        _encode(buf, command)
+    writer.write(buf)
+    if writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+        await writer.drain()
+
+
+def encode_into(buf: bytearray, data: Union[bytes, str, int, Error, list, tuple, None]):
+    """ Append ``data`` frame to ``buf``, so that several replies are written at once """
+    frame = _constant_frame(data)
+    if frame is not None:
+        buf += frame
+    else:
+        _encode(buf, data)
+
+
+@lru_cache(maxsize=128)
+def error_frame(message: str) -> bytes:
+    """ Encoded error reply: error messages are constant, so frames are cached """
+    return b"-%s\r\n" % message.encode()
+
+
+def serialize(data: Union[bytes, str, int, Error, list, tuple, None]) -> bytearray:
+    """
+    Serialize ``data`` into a new buffer. It is never reused afterwards,
+    so it can be given to a transport without copying.
+    """
+    verb = data[0] if isinstance(data, tuple) and data else None
+    prefixes = _REQUEST_PREFIXES.get(verb) if type(verb) is bytes else None
+    if prefixes is not None and len(data) < len(prefixes):
+        buf = bytearray(prefixes[len(data)])
+        for i in range(1, len(data)):
+            # Usual argument types are framed inline, the rest go to _encode
+            arg = data[i]
+            arg_type = type(arg)
+            if arg_type is bytes:
+                n = len(arg)
+                buf += _BYTES_HEADERS[n] if n < _HEADER_CACHE_SIZE else b"$%d\r\n" % n
+                buf += arg
+                buf += b"\r\n"
+            elif arg_type is str:
+                arg = arg.encode()
+                n = len(arg)
+                buf += _STR_HEADERS[n] if n < _HEADER_CACHE_SIZE else b"+%d\r\n" % n
+                buf += arg
+                buf += b"\r\n"
+            else:
+                _encode(buf, arg)
+    else:
+        buf = bytearray()
+        _encode(buf, data)
+    return buf
+
+
+def _constant_frame(data) -> Union[bytes, None]:
+    """ Pre-encoded frame of a common reply or None """
+    data_type = type(data)
+    if data_type is int:
+        i = data - _INT_CACHE_MIN
+        return _INT_CACHE[i] if 0 <= i < len(_INT_CACHE) else None
+    if data_type is str:
+        return _STR_FRAMES.get(data)
+    if data is None:
+        return b"$-1\r\n"
+    return None
+
+
+def _encode(buf: bytearray, data: Union[bytes, str, int, Error, list, tuple, None]):
+    """ Append encoded ``data`` to ``buf``, arrays are encoded into it in place """
+    # Exact type checks go first: parsed data are never subclasses
+    data_type = type(data)
+    if data_type is bytes:
+        n = len(data)
+        buf += _BYTES_HEADERS[n] if n < _HEADER_CACHE_SIZE else b"$%d\r\n" % n
+        buf += data
+        buf += b"\r\n"
+    elif data_type is int:
+        i = data - _INT_CACHE_MIN
+        buf += _INT_CACHE[i] if 0 <= i < len(_INT_CACHE) else b":%d\r\n" % data
+    elif data_type is str:
+        data = data.encode()
+        n = len(data)
+        buf += _STR_HEADERS[n] if n < _HEADER_CACHE_SIZE else b"+%d\r\n" % n
+        buf += data
+        buf += b"\r\n"
+    elif data_type is list or data_type is tuple:
+        n = len(data)
+        buf += _ARRAY_HEADERS[n] if n < _HEADER_CACHE_SIZE else b"*%d\r\n" % n
+        for item in data:
+            # Array items are mostly bulk strings: no call for each of them
+            if type(item) is bytes:
+                n = len(item)
+                buf += _BYTES_HEADERS[n] if n < _HEADER_CACHE_SIZE else b"$%d\r\n" % n
+                buf += item
+                buf += b"\r\n"
+            else:
+                _encode(buf, item)
+    elif data is None:
+        buf += b"$-1\r\n"
+    elif isinstance(data, bytes):
+        _encode(buf, bytes(data))
     elif isinstance(data, str):
-        writer.write(b"+%d\r\n%s\r\n" % (len(data), data.encode()))
+        _encode(buf, str(data))
     elif isinstance(data, int):
-        writer.write(b":%d\r\n" % data)
+        _encode(buf, int(data))
     elif isinstance(data, Error):
-        writer.write(b"-%s\r\n" % data.message.encode())
+        buf += error_frame(data.message)
     elif isinstance(data, (list, tuple)):
-        writer.write(b"*%d\r\n" % len(data))
-        for item in data:
-            _write_response(writer, item)
-    elif data is None:
-        writer.write(b"$-1\r\n")
+        _encode(buf, tuple(data))
     else:
         raise RadishProtocolError("Unrecognized type: %s" % type(data))
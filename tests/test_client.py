@@ -0,0 +1,219 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from radish.client import client as client_module
+from radish.client import Connection, ConnectionPool, PipelinedConnection
+from radish.database import Server
+from radish.exceptions import RadishClientError
+
+
+@pytest_asyncio.fixture
+async def port():
+    loop = asyncio.get_running_loop()
+    server = Server(loop=loop)
+    tcp_server = await loop.create_server(server._new_handler, "127.0.0.1", 0)
+    yield tcp_server.sockets[0].getsockname()[1]
+    tcp_server.close()
+
+
+@pytest.mark.asyncio
+async def test_connection(port):
+    async with Connection(port=port) as con:
+        assert await con.set("key", "val") == 1
+        assert await con.get("key") == "val"
+        assert await con.ping() == "PONG"
+
+
+@pytest.mark.asyncio
+async def test_execute_many(port):
+    async with Connection(port=port) as con:
+        assert await con.execute_many(
+            (b"SET", "key", b"val"), (b"GET", "key"), (b"EXISTS", "key", "no")
+        ) == [1, b"val", 1]
+
+
+@pytest.mark.asyncio
+async def test_execute_many_quit(port):
+    async with Connection(port=port) as con:
+        assert await con.execute_many(
+            (b"SET", "key", b"val"), (b"QUIT",), (b"GET", "key")
+        ) == [1, None, b"val"]
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections(port):
+    async with ConnectionPool(port=port, min_size=1, max_size=3) as pool:
+
+        async def run_client(i):
+            async with pool.acquire() as con:
+                assert await con.echo(i) == i
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[run_client(i) for i in range(20)])
+        assert len(pool._clients) == 3
+        assert len(pool._free) == 3
+
+
+@pytest.mark.asyncio
+async def test_pool_auto_batch(port):
+    async with ConnectionPool(port=port, min_size=1, auto_batch=True) as pool:
+
+        async def run_client(i):
+            async with pool.acquire() as con:
+                return await con.echo(i)
+
+        assert await asyncio.gather(*[run_client(i) for i in range(100)]) == list(
+            range(100)
+        )
+
+
+@pytest.mark.asyncio
+async def test_pool_borrow(port):
+    async with ConnectionPool(port=port, min_size=1, max_size=1) as pool:
+        con = await pool.borrow()
+        try:
+            assert await con.ping() == "PONG"
+        finally:
+            pool.release(con)
+        assert await pool.borrow() is con
+
+
+@pytest.mark.asyncio
+async def test_pipelined_connection(port):
+    async with PipelinedConnection(port=port) as con:
+        assert await asyncio.gather(*[con.echo(i) for i in range(100)]) == list(
+            range(100)
+        )
+        assert await con.execute_many(
+            (b"SET", "key", b"val"), (b"QUIT",), (b"GET", "key")
+        ) == [1, None, b"val"]
+
+
+@pytest.mark.asyncio
+async def test_server_replies_to_whole_chunk(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"*1\r\n$4\r\nPING\r\n*1\r\n$3\r\nBAD\r\n*1\r\n$4\r\nQUIT\r\n")
+    assert await reader.read() == b"+4\r\nPONG\r\n-Bad command\r\n"
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_server_rejects_malformed_requests(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"*1\r\n$4\r\nPING\r\n"
+        b"*1\r\n:5\r\n"
+        b"*1\r\n*1\r\n$3\r\nGET\r\n"
+        b"*3\r\n$3\r\nSET\r\n*0\r\n$1\r\nv\r\n"
+        b"*1\r\n$4\r\nQUIT\r\n"
+    )
+    assert await reader.read() == (
+        b"+4\r\nPONG\r\n"
+        b"-Bad request format\r\n"
+        b"-Bad request format\r\n"
+        b"-Wrong type of argument\r\n"
+    )
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_pipelined_connection_connects_once(port):
+    con = PipelinedConnection(port=port)
+    assert await asyncio.wait_for(
+        asyncio.gather(*[con.echo(i) for i in range(10)]), 1
+    ) == list(range(10))
+    reader_task = con._reader_task
+    con._writer.transport.abort()
+    # Commands are sent again over a single new connection
+    assert await asyncio.wait_for(
+        asyncio.gather(*[con.echo(i) for i in range(10)]), 1
+    ) == list(range(10))
+    assert con._reader_task is not reader_task
+    await con.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_close_inside_acquire(port):
+    async with ConnectionPool(port=port, min_size=1, max_size=2) as pool:
+        async with pool.acquire() as con:
+            await con.close()
+        assert len(pool._free) == 1
+        assert await pool.borrow() is not await pool.borrow()
+
+
+@pytest.mark.asyncio
+async def test_server_keeps_paused_connections():
+    loop = asyncio.get_running_loop()
+    server = Server(loop=loop, closing_delay=0.1)
+    tcp_server = await loop.create_server(server._new_handler, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    idle_reader, idle_writer = await asyncio.open_connection("127.0.0.1", port)
+    await asyncio.sleep(0.01)
+    (idle,) = server._handlers
+    paused_reader, paused_writer = await asyncio.open_connection("127.0.0.1", port)
+    await asyncio.sleep(0.01)
+    (paused,) = server._handlers - {idle}
+    paused.pause_writing()
+    assert await asyncio.wait_for(idle_reader.read(), 1) == b""
+    assert server._handlers == {paused}
+    paused.resume_writing()
+    assert await asyncio.wait_for(paused_reader.read(), 1) == b""
+    idle_writer.close()
+    paused_writer.close()
+    tcp_server.close()
+
+
+@pytest.mark.asyncio
+async def test_pipelined_connection_server_closes():
+    connections = 0
+
+    async def handle(reader, writer):
+        nonlocal connections
+        connections += 1
+        await reader.read(1)
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    con = PipelinedConnection(port=port)
+    with pytest.raises(RadishClientError):
+        await asyncio.wait_for(con.ping(), 1)
+    with pytest.raises(RadishClientError):
+        await asyncio.wait_for(con.execute_many((b"PING",), (b"PING",)), 1)
+    # Every call is sent again once over a new connection
+    assert connections == 4
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_borrow_cancelled_during_connect(port, monkeypatch):
+    open_connection = client_module._open_connection
+
+    async def hang(*args):
+        await asyncio.sleep(10)
+
+    async with ConnectionPool(port=port, min_size=0, max_size=2) as pool:
+        monkeypatch.setattr(client_module, "_open_connection", hang)
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.borrow(), 0.01)
+        assert pool._clients == []
+        monkeypatch.setattr(client_module, "_open_connection", open_connection)
+        con = await asyncio.wait_for(pool.borrow(), 1)
+        assert await con.ping() == "PONG"
+        pool.release(con)
+
+
+@pytest.mark.asyncio
+async def test_pool_auto_batch_opens_one_connection():
+    loop = asyncio.get_running_loop()
+    server = Server(loop=loop)
+    tcp_server = await loop.create_server(server._new_handler, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    async with ConnectionPool(port=port, auto_batch=True) as pool:
+        async with pool.acquire() as con:
+            assert await con.ping() == "PONG"
+        assert server.active_connections == 1
+    tcp_server.close()
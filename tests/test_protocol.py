@@ -0,0 +1,75 @@
+import pytest
+
+from radish.exceptions import RadishBadRequest
+from radish.protocol import NEED_MORE, READ_SIZE, Error, RESPParser, serialize
+
+
+def dump(data):
+    return bytes(serialize(data))
+
+
+@pytest.fixture
+def parser():
+    return RESPParser()
+
+
+def test_roundtrip(parser: RESPParser):
+    data = [b"SET", "ключ", 12, -1000, 2**70, None, [b"", -1, "OK"]]
+    parser.feed(dump(data))
+    assert parser.parse_one() == data
+    assert parser.parse_one() is NEED_MORE
+
+
+def test_error(parser: RESPParser):
+    parser.feed(b"-Bad command\r\n")
+    assert parser.parse_one() == Error(b"Bad command")
+
+
+def test_pipelined(parser: RESPParser):
+    parser.feed(dump((b"PING",)) + dump((b"GET", b"key")))
+    assert parser.parse_one() == [b"PING"]
+    assert parser.parse_one() == [b"GET", b"key"]
+    assert parser.parse_one() is NEED_MORE
+
+
+def test_chunked(parser: RESPParser):
+    frame = dump((b"MSET", b"key", b"x" * 1000, "k", 1))
+    for i in range(len(frame) - 1):
+        parser.feed(frame[i : i + 1])
+        assert parser.parse_one() is NEED_MORE
+    parser.feed(frame[-1:])
+    assert parser.parse_one() == [b"MSET", b"key", b"x" * 1000, "k", 1]
+
+
+def test_chunked_nested(parser: RESPParser):
+    data = [b"a", [[], [1, "b", None], [b"c" * 20]], -1]
+    frame = dump(data)
+    for i in range(len(frame) - 1):
+        parser.feed(frame[i : i + 1])
+        assert parser.parse_one() is NEED_MORE
+    parser.feed(frame[-1:] + dump((b"PING",)))
+    assert parser.parse_one() == data
+    assert parser.parse_one() == [b"PING"]
+
+
+def test_chunked_large_array(parser: RESPParser):
+    data = [b"value%06d" % i for i in range(80000)]
+    frame = dump(data)
+    for i in range(0, len(frame) - READ_SIZE, READ_SIZE):
+        parser.feed(frame[i : i + READ_SIZE])
+        assert parser.parse_one() is NEED_MORE
+        # Parsed items are not kept in the buffer to be parsed again
+        assert len(parser.buf) - parser._pos < READ_SIZE
+    parser.feed(frame[i + READ_SIZE :])
+    assert parser.parse_one() == data
+
+
+def test_bad_data(parser: RESPParser):
+    parser.feed(b"?bad\r\n")
+    with pytest.raises(RadishBadRequest):
+        parser.parse_one()
+    parser.feed(b":x\r\n")
+    with pytest.raises(RadishBadRequest):
+        parser.parse_one()
+    parser.feed(b":1\r\n")
+    assert parser.parse_one() == 1
@@ -92,3 +92,40 @@ def test_strlen(db: RadishStore):
     db._store = {b"k1": b"Hello, I am byte string"}
     assert db.strlen(b"k1") == 23
     assert db.strlen(b"k3") == 0
+
+
+def test_process_request(db: RadishStore):
+    assert db.process_request([b"SET", b"key", b"val"]) == 1
+    assert db.process_request([b"get", b"key"]) == b"val"
+    assert db.process_request([b"Exists", b"key", b"EXISTS"]) == 1
+
+
+@pytest.mark.parametrize(
+    "request_",
+    [
+        [b"GET"],
+        [b"GET", b"k1", b"k2"],
+        [b"SET", b"key"],
+        [b"DEL"],
+        [b"FLUSHDB", b"key"],
+        [b"EXISTS"],
+        [b"ECHO"],
+        [b"MSET", b"key"],
+        [b"MSET", b"key", b"val", b"key2"],
+        [b"MGET"],
+        [b"STRLEN"],
+    ],
+)
+def test_process_request_arity(db: RadishStore, request_):
+    with pytest.raises(RadishBadRequest):
+        db.process_request(request_)
+    assert db._store == {}
+
+
+def test_process_request_uses_handlers(db: RadishStore):
+    class Store(RadishStore):
+        def _get(self, request):
+            return b"overridden"
+
+    assert Store().process_request([b"GET", b"key"]) == b"overridden"
+    assert Store().get(b"key") == b"overridden"